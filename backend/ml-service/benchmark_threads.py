@@ -0,0 +1,172 @@
+"""
+Thread allocation benchmark for GangaGuard
+Measures detection throughput for combinations of detector processes and
+intra-op threads per process, to pick ML_WORKER_PROCESSES and ML_INFERENCE_THREADS.
+
+Usage:
+    python benchmark_threads.py [image_path] --processes 1 2 4 --threads 1 2 4 8
+"""
+import os
+import time
+import queue
+import argparse
+import multiprocessing
+from pathlib import Path
+from typing import Optional, List
+
+# Configuration
+BENCHMARK_SECONDS = float(os.getenv("BENCHMARK_SECONDS", "10"))
+STARTUP_TIMEOUT_SECONDS = float(os.getenv("BENCHMARK_STARTUP_TIMEOUT", "300"))  # model load and warm-up
+WARMUP_RUNS = 3
+
+
+def _benchmark_worker(image_path: Optional[str], threads: int, processes: int, index: int,
+                      pin: bool, duration: float, start_barrier, results):
+    """
+    Run detect_garbage in a loop for `duration` seconds inside one detector process.
+
+    Puts (frames, elapsed_seconds, error) on `results`; error is None on success.
+    On failure the start barrier is aborted so the other workers stop waiting.
+    """
+    # Must be set before ml_service (and with it numpy/torch) is imported
+    os.environ["ML_INFERENCE_THREADS"] = str(threads)
+    os.environ["ML_WORKER_PROCESSES"] = str(processes)
+    os.environ["ML_WORKER_INDEX"] = str(index)
+    os.environ["ML_PIN_THREADS"] = "1" if pin else "0"
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"):
+        os.environ.pop(name, None)
+
+    try:
+        import runtime_config  # exports the BLAS thread budget before numpy loads
+        import numpy as np
+        from PIL import Image
+        from ml_service import MLService
+
+        ml_service = MLService()
+        if ml_service.model is None:
+            raise RuntimeError("No model loaded. Add a model to the models/ folder.")
+        if image_path:
+            image = Image.open(image_path).convert("RGB")
+        else:
+            image = np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8)
+
+        for _ in range(WARMUP_RUNS):
+            ml_service.detect_garbage(image)
+
+        start_barrier.wait(timeout=STARTUP_TIMEOUT_SECONDS)
+        frames = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            ml_service.detect_garbage(image)
+            frames += 1
+        results.put((frames, time.perf_counter() - start, None))
+    except Exception as e:
+        start_barrier.abort()
+        results.put((0, 0.0, f"worker {index}: {type(e).__name__}: {str(e)}"))
+
+
+def run_benchmark(image_path: Optional[Path], processes: int, threads: int,
+                  pin: bool = False, duration: float = BENCHMARK_SECONDS) -> dict:
+    """
+    Measure aggregate throughput for one thread allocation.
+
+    Args:
+        image_path: Image to run detection on (random noise if None)
+        processes: Number of concurrent detector processes
+        threads: Intra-op threads per process
+        pin: Pin each process to its share of the inference cores
+        duration: Seconds to measure after warm-up
+
+    Returns:
+        Dictionary with the allocation, total FPS and mean latency per frame
+
+    Raises:
+        RuntimeError: If a worker fails, crashes or does not report in time
+    """
+    # Spawn so each worker imports numpy/torch with its own thread settings
+    context = multiprocessing.get_context("spawn")
+    start_barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=_benchmark_worker,
+            args=(str(image_path) if image_path else None, threads, processes, index,
+                  pin, duration, start_barrier, results),
+        )
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    measurements = []
+    error = None
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS + duration
+    try:
+        while len(measurements) < processes and error is None:
+            try:
+                frames, elapsed, error = results.get(timeout=1)
+                if error is None:
+                    measurements.append((frames, elapsed))
+            except queue.Empty:
+                crashed = [w for w in workers if w.exitcode not in (None, 0)]
+                if crashed:
+                    error = f"worker exited with code {crashed[0].exitcode}"
+                elif time.monotonic() > deadline:
+                    error = f"no result within {STARTUP_TIMEOUT_SECONDS + duration:.0f}s"
+    finally:
+        for worker in workers:
+            if worker.is_alive() and error is not None:
+                worker.terminate()
+            worker.join()
+
+    if error is not None:
+        raise RuntimeError(error)
+
+    total_fps = sum(frames / elapsed for frames, elapsed in measurements)
+    latency_ms = sum(elapsed * 1000 / max(frames, 1) for frames, elapsed in measurements) / processes
+    return {
+        "processes": processes,
+        "threads": threads,
+        "total_threads": processes * threads,
+        "fps": total_fps,
+        "latency_ms": latency_ms,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point for the thread allocation benchmark."""
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark detection throughput against thread allocation.")
+    parser.add_argument("image", type=Path, nargs="?", help="Image to benchmark on (default: random noise)")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2], help="Detector process counts")
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cpu_count}), help="Intra-op threads per process")
+    parser.add_argument("--pin", action="store_true", help="Pin each process to its own cores")
+    parser.add_argument("--duration", type=float, default=BENCHMARK_SECONDS, help="Seconds per allocation")
+    args = parser.parse_args(argv)
+
+    print("🚀 Starting GangaGuard thread allocation benchmark...")
+    print(f"🖥️  CPUs: {cpu_count}")
+    print(f"⏱️  Duration: {args.duration:.0f}s per allocation\n")
+
+    rows = []
+    for processes in args.processes:
+        for threads in args.threads:
+            try:
+                row = run_benchmark(args.image, processes, threads, args.pin, args.duration)
+            except RuntimeError as e:
+                print(f"❌ Benchmark aborted: {str(e)}")
+                return
+            oversubscribed = " (oversubscribed)" if row["total_threads"] > cpu_count else ""
+            print(f"   {processes} process(es) x {threads} thread(s): "
+                  f"{row['fps']:.1f} FPS, {row['latency_ms']:.1f} ms/frame{oversubscribed}")
+            rows.append(row)
+
+    best = max(rows, key=lambda r: r["fps"])
+    print(f"\n🏆 Best: ML_WORKER_PROCESSES={best['processes']} ML_INFERENCE_THREADS={best['threads']} "
+          f"({best['fps']:.1f} FPS)")
+
+
+if __name__ == "__main__":
+    main()
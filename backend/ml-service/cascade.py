@@ -0,0 +1,159 @@
+"""
+Two-stage cascade for GangaGuard ML Service
+A cheap garbage/no-garbage gate runs on a heavily downscaled frame, and the full
+YOLO detector only runs when the gate's score reaches a recall-oriented threshold.
+
+The gate is either a tiny classifier/detector (CASCADE_GATE_MODEL) or, by default,
+the detector's own low-resolution pass. A fraction of rejected frames is audited
+with the full detector to estimate how many detections the gate misses compared
+with always-on detection.
+
+Environment variables:
+    CASCADE_ENABLED            "1" to enable the gate (default: "0")
+    CASCADE_GATE_MODEL         Optional gate model file (default: reuse the detector)
+    CASCADE_GATE_IMGSZ         Gate input size in pixels (default: 160)
+    CASCADE_GATE_THRESHOLD     Gate score needed to run the full detector (default: 0.05)
+    CASCADE_AUDIT_RATE         Fraction of rejected frames re-checked by the full detector (default: 0.05)
+    CASCADE_NEGATIVE_CLASSES   Classifier classes meaning "no garbage" (default: "clean,no_garbage,background")
+"""
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+import numpy as np
+from ultralytics import YOLO
+
+# Configuration
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_GATE_MODEL = os.getenv("CASCADE_GATE_MODEL")
+CASCADE_GATE_IMGSZ = int(os.getenv("CASCADE_GATE_IMGSZ", "160"))
+CASCADE_GATE_THRESHOLD = float(os.getenv("CASCADE_GATE_THRESHOLD", "0.05"))
+CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.05"))
+CASCADE_NEGATIVE_CLASSES = {
+    name.strip() for name in os.getenv("CASCADE_NEGATIVE_CLASSES", "clean,no_garbage,background").split(",")
+    if name.strip()
+}
+
+
+class CascadeGate:
+    """Cheap first stage that decides whether a frame needs full detection."""
+
+    def __init__(self, detector: YOLO, gate_model_path: Optional[Path] = None,
+                 imgsz: int = CASCADE_GATE_IMGSZ, threshold: float = CASCADE_GATE_THRESHOLD,
+                 audit_rate: float = CASCADE_AUDIT_RATE):
+        """
+        Initialize the gate.
+
+        Args:
+            detector: Loaded full YOLO detector (used as the gate if no gate model is given)
+            gate_model_path: Optional tiny classification or detection model for the gate
+            imgsz: Gate input size; frames are downscaled to this before scoring
+            threshold: Minimum gate score for the full detector to run. Keep it low to favour recall.
+            audit_rate: Fraction of rejected frames also run through the full detector
+
+        Raises:
+            ValueError: If a classifier gate has none of CASCADE_NEGATIVE_CLASSES, since
+                        its garbage score (1 - P(negative classes)) would be undefined
+        """
+        self.imgsz = imgsz
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.model = YOLO(str(gate_model_path)) if gate_model_path else detector
+        self.is_classifier = getattr(self.model, "task", "detect") == "classify"
+        self.negative_class_ids = [
+            class_id for class_id, name in self.model.names.items() if name in CASCADE_NEGATIVE_CLASSES
+        ]
+        if self.is_classifier and not self.negative_class_ids:
+            raise ValueError(
+                f"Gate classifier classes {list(self.model.names.values())} include none of "
+                f"CASCADE_NEGATIVE_CLASSES {sorted(CASCADE_NEGATIVE_CLASSES)}"
+            )
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "frames": 0,
+            "passed": 0,
+            "rejected": 0,  # gate score below threshold (skipped + audited)
+            "skipped": 0,   # rejected and the full detector did not run
+            "audited": 0,   # rejected but the full detector ran for the miss-rate check
+            "audit_frames_missed": 0,
+            "audit_detections_missed": 0,
+        }
+
+    def score(self, image_array: np.ndarray) -> float:
+        """
+        Garbage score for a frame from the low-resolution gate pass.
+
+        Args:
+            image_array: Frame as a numpy array
+
+        Returns:
+            Score in [0, 1]: highest box confidence for a detector gate, or
+            1 - P(negative classes) for a classifier gate
+        """
+        if self.is_classifier:
+            probs = self.model(image_array, imgsz=self.imgsz, verbose=False)[0].probs
+            return 1.0 - float(sum(probs.data[class_id] for class_id in self.negative_class_ids))
+
+        boxes = self.model(image_array, imgsz=self.imgsz, conf=self.threshold, verbose=False)[0].boxes
+        return float(boxes.conf.max()) if len(boxes) else 0.0
+
+    def check(self, image_array: np.ndarray) -> Tuple[bool, bool]:
+        """
+        Decide whether a frame goes to the full detector.
+
+        Args:
+            image_array: Frame as a numpy array
+
+        Returns:
+            Tuple of (gate_passed, audit). The full detector should run when either
+            is True; audit means the gate rejected the frame but it was sampled for
+            a miss-rate check and must be reported back with record_audit().
+        """
+        passed = self.score(image_array) >= self.threshold
+        audit = not passed and random.random() < self.audit_rate
+
+        with self._lock:
+            self._stats["frames"] += 1
+            if passed:
+                self._stats["passed"] += 1
+            else:
+                self._stats["rejected"] += 1
+                if audit:
+                    self._stats["audited"] += 1
+                else:
+                    self._stats["skipped"] += 1
+        return passed, audit
+
+    def record_audit(self, detection_count: int):
+        """
+        Record the full detector's result on an audited frame the gate rejected.
+
+        Args:
+            detection_count: Number of detections the full detector found
+        """
+        if detection_count == 0:
+            return
+        with self._lock:
+            self._stats["audit_frames_missed"] += 1
+            self._stats["audit_detections_missed"] += detection_count
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Gate statistics since start-up.
+
+        Returns:
+            Counters plus skip_rate (share of frames where the full detector did
+            not run), miss_rate (share of audited frames where the full detector
+            found garbage) and missed_detections_estimate (audited misses scaled to
+            the skipped frames; misses on audited frames were caught and returned)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["skip_rate"] = stats["skipped"] / stats["frames"] if stats["frames"] else 0.0
+        stats["miss_rate"] = stats["audit_frames_missed"] / stats["audited"] if stats["audited"] else 0.0
+        stats["missed_detections_estimate"] = (
+            stats["audit_detections_missed"] * stats["skipped"] / stats["audited"] if stats["audited"] else 0.0
+        )
+        return stats
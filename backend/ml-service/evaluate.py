@@ -0,0 +1,501 @@
+"""
+Offline evaluation for GangaGuard
+Runs YOLO models over a labelled local dataset and sweeps model file, image size,
+device and confidence threshold to compare accuracy against speed.
+mAP is computed once per model/image size/device; confidence thresholds only
+change the reported precision and recall.
+
+Dataset layout (YOLO format):
+    <dataset>/images/.../frame_001.jpg
+    <dataset>/labels/.../frame_001.txt   # one "class cx cy w h" row per object (normalised)
+
+Per-image predictions are cached in EVAL_CACHE_DIR at a low confidence floor, so
+new confidence thresholds or metrics are computed from the cache without
+re-running inference. Latencies are cached per timing setup (worker count and
+threads per worker), so changing --workers re-times the images instead of
+reusing numbers measured under different CPU contention.
+
+Usage:
+    python evaluate.py path/to/dataset --imgsz 320 480 640 --conf 0.1 0.25 0.5
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Tuple
+# Imported before numpy so the BLAS thread budget is exported in time
+import runtime_config
+import numpy as np
+import cv2
+from ultralytics import YOLO
+
+# Configuration
+MODEL_DIR = Path(__file__).parent / "models"
+EVAL_CACHE_DIR = Path(os.getenv("EVAL_CACHE_DIR", str(Path(__file__).parent / "eval_cache")))
+EVAL_OUTPUT_DIR = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path(__file__).parent / "eval_reports")))
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "2"))  # parallel inference configurations
+CONF_FLOOR = 0.001  # predictions are cached down to this confidence
+WARMUP_RUNS = 3  # untimed inferences before latency is measured
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def find_dataset_images(dataset_dir: Path) -> List[Tuple[Path, Path]]:
+    """
+    Find images and their YOLO label files.
+
+    Labels are looked up by swapping the "images" directory for "labels", the
+    convention used by Ultralytics datasets. Images without a label file are
+    treated as background frames (no objects).
+
+    Args:
+        dataset_dir: Dataset root containing images/ and labels/
+
+    Returns:
+        Sorted list of (image_path, label_path) tuples
+    """
+    images_dir = dataset_dir / "images"
+    labels_dir = dataset_dir / "labels"
+    if not images_dir.exists():
+        images_dir, labels_dir = dataset_dir, dataset_dir
+
+    pairs = []
+    for image_path in sorted(images_dir.rglob("*")):
+        if image_path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        relative = image_path.relative_to(images_dir).with_suffix(".txt")
+        pairs.append((image_path, labels_dir / relative))
+    return pairs
+
+
+def load_labels(label_path: Path, width: int, height: int) -> np.ndarray:
+    """
+    Read a YOLO label file as pixel boxes.
+
+    Args:
+        label_path: Path to the .txt label file
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Array of shape (N, 5) with rows [x1, y1, x2, y2, class_id]
+    """
+    if not label_path.exists():
+        return np.zeros((0, 5))
+
+    rows = []
+    for line in label_path.read_text().splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        class_id, cx, cy, w, h = (float(p) for p in parts[:5])
+        rows.append([
+            (cx - w / 2) * width,
+            (cy - h / 2) * height,
+            (cx + w / 2) * width,
+            (cy + h / 2) * height,
+            class_id,
+        ])
+    return np.array(rows).reshape(-1, 5)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:4] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:4] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def cache_path_for(model_path: Path, imgsz: int, device: str, dataset_dir: Path) -> Path:
+    """
+    Cache file for one inference configuration on one dataset.
+
+    The key includes the model file's size and modification time so a retrained
+    model with the same name does not reuse stale predictions.
+    """
+    stat = model_path.stat()
+    key = f"{model_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{imgsz}|{device}|{dataset_dir.resolve()}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return EVAL_CACHE_DIR / f"{model_path.stem}-{imgsz}-{device.replace(':', '')}-{digest}.json"
+
+
+def _init_worker(threads: int):
+    """
+    Limit each evaluation worker to its share of the CPU threads.
+
+    Workers are not pinned: ML_PIN_THREADS and ML_WORKER_INDEX describe the
+    deployment, and applying them here would pin every pool worker to the same cores.
+    """
+    runtime_config.configure_runtime("inference", threads=threads, pin=False)
+
+
+def run_inference(model_path: Path, imgsz: int, device: str, dataset_dir: Path,
+                  timing_key: str = "workers=1") -> Dict[str, Any]:
+    """
+    Run one model configuration over the dataset, reusing cached predictions.
+
+    Images are inferred if their predictions are missing from the cache or they
+    have not been timed under `timing_key` yet. Each cached entry holds the raw
+    predictions down to CONF_FLOOR; latencies are stored per timing key.
+
+    Args:
+        model_path: Model file (any format Ultralytics can load: .pt, .onnx, ...)
+        imgsz: Inference image size
+        device: Torch device string, e.g. "cpu" or "cuda:0"
+        dataset_dir: Dataset root
+        timing_key: Identifies the CPU contention latencies were measured under
+
+    Returns:
+        Cache contents: {"model", "imgsz", "device", "names", "images": {rel_path: entry},
+        "latency_ms": {timing_key: {rel_path: ms}}, "timing": timing_key}
+    """
+    cache_file = cache_path_for(model_path, imgsz, device, dataset_dir)
+    if cache_file.exists():
+        cache = json.loads(cache_file.read_text())
+    else:
+        cache = {"model": str(model_path), "imgsz": imgsz, "device": device, "names": {}, "images": {}}
+    cache["timing"] = timing_key
+    latencies = cache.setdefault("latency_ms", {}).setdefault(timing_key, {})
+
+    pending = []
+    for image_path, _ in find_dataset_images(dataset_dir):
+        relative = image_path.relative_to(dataset_dir).as_posix()
+        if relative not in cache["images"] or relative not in latencies:
+            pending.append((image_path, relative))
+    if not pending:
+        return cache
+
+    model = YOLO(str(model_path))
+    cache["names"] = {str(k): v for k, v in model.names.items()}
+
+    warmup = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(WARMUP_RUNS):
+        model(warmup, imgsz=imgsz, device=device, conf=CONF_FLOOR, verbose=False)
+
+    for image_path, relative in pending:
+        image = cv2.imread(str(image_path))
+        if image is None:
+            continue
+
+        start = time.perf_counter()
+        results = model(image, imgsz=imgsz, device=device, conf=CONF_FLOOR, verbose=False)[0]
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        latencies[relative] = latency_ms
+        cache["images"][relative] = {
+            "shape": list(image.shape[:2]),
+            "boxes": results.boxes.data.tolist(),  # [x1, y1, x2, y2, conf, cls]
+        }
+
+    EVAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps(cache))
+    return cache
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """All-point interpolated area under a precision/recall curve."""
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def compute_metrics(cache: Dict[str, Any], dataset_dir: Path, conf_values: List[float]) -> Dict[str, Any]:
+    """
+    Score the cached predictions of one inference configuration.
+
+    Predictions are matched greedily to ground truth of the same class in
+    descending confidence order. mAP is computed once from all predictions down
+    to CONF_FLOOR, as Ultralytics does, and reported at IoU 0.5 and averaged
+    over IoU 0.5:0.95. Precision and recall use IoU 0.5 and are reported for
+    each confidence threshold, since the threshold only changes which
+    detections are acted on, not the model's ranking quality or speed.
+
+    Args:
+        cache: Output of run_inference()
+        dataset_dir: Dataset root
+        conf_values: Confidence thresholds for precision and recall
+
+    Returns:
+        Dictionary of accuracy and speed metrics, with "thresholds" holding
+        {"conf", "precision", "recall"} for each confidence threshold
+    """
+    # Per prediction: class, confidence and a TP flag for each IoU threshold
+    pred_classes, pred_scores, pred_hits = [], [], []
+    gt_per_class: Dict[int, int] = {}
+    timed = cache["latency_ms"].get(cache["timing"], {})
+    latencies = []
+
+    for image_path, label_path in find_dataset_images(dataset_dir):
+        relative = image_path.relative_to(dataset_dir).as_posix()
+        entry = cache["images"].get(relative)
+        if entry is None or relative not in timed:
+            continue
+        latencies.append(timed[relative])
+
+        height, width = entry["shape"]
+        gt = load_labels(label_path, width, height)
+        for class_id in gt[:, 4].astype(int):
+            gt_per_class[class_id] = gt_per_class.get(class_id, 0) + 1
+
+        preds = np.array(entry["boxes"]).reshape(-1, 6)
+        preds = preds[np.argsort(-preds[:, 4])]
+        if len(preds) == 0:
+            continue
+
+        hits = np.zeros((len(preds), len(IOU_THRESHOLDS)), dtype=bool)
+        if len(gt):
+            iou = box_iou(preds[:, :4], gt[:, :4])
+            iou[preds[:, 5][:, None] != gt[:, 4][None, :]] = 0.0
+            for t, threshold in enumerate(IOU_THRESHOLDS):
+                matched = np.zeros(len(gt), dtype=bool)
+                for p in range(len(preds)):
+                    candidates = np.where((iou[p] >= threshold) & ~matched)[0]
+                    if len(candidates):
+                        best = candidates[np.argmax(iou[p, candidates])]
+                        matched[best] = True
+                        hits[p, t] = True
+
+        pred_classes.append(preds[:, 5].astype(int))
+        pred_scores.append(preds[:, 4])
+        pred_hits.append(hits)
+
+    total_gt = sum(gt_per_class.values())
+    if pred_scores:
+        classes = np.concatenate(pred_classes)
+        scores = np.concatenate(pred_scores)
+        hits = np.concatenate(pred_hits)
+    else:
+        classes = np.zeros(0, dtype=int)
+        scores = np.zeros(0)
+        hits = np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+
+    ap = np.zeros((len(gt_per_class), len(IOU_THRESHOLDS)))
+    for c, (class_id, n_gt) in enumerate(sorted(gt_per_class.items())):
+        mask = classes == class_id
+        if not mask.any():
+            continue
+        order = np.argsort(-scores[mask])
+        class_hits = hits[mask][order]
+        tp = np.cumsum(class_hits, axis=0)
+        fp = np.cumsum(~class_hits, axis=0)
+        for t in range(len(IOU_THRESHOLDS)):
+            ap[c, t] = average_precision(tp[:, t] / n_gt, tp[:, t] / np.maximum(tp[:, t] + fp[:, t], 1))
+
+    # Greedy matching runs in confidence order, so filtering by a threshold
+    # keeps exactly the matches the remaining predictions had
+    thresholds = []
+    for conf in conf_values:
+        kept = scores >= conf
+        true_positives = int(hits[kept, 0].sum())
+        thresholds.append({
+            "conf": conf,
+            "precision": true_positives / int(kept.sum()) if kept.any() else 0.0,
+            "recall": true_positives / total_gt if total_gt else 0.0,
+        })
+
+    latency = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "images": len(latencies),
+        "thresholds": thresholds,
+        "map50": float(ap[:, 0].mean()) if len(ap) else 0.0,
+        "map50_95": float(ap.mean()) if len(ap) else 0.0,
+        "latency_mean_ms": float(latency.mean()),
+        "latency_p50_ms": float(np.percentile(latency, 50)),
+        "latency_p95_ms": float(np.percentile(latency, 95)),
+        "throughput_fps": float(1000.0 / latency.mean()) if latency.mean() > 0 else 0.0,
+    }
+
+
+def pareto_front(rows: List[Dict[str, Any]], accuracy_key: str = "map50",
+                 latency_key: str = "latency_p50_ms") -> List[Dict[str, Any]]:
+    """
+    Keep configurations that no other configuration beats on both accuracy and latency.
+
+    Args:
+        rows: Evaluated configurations
+        accuracy_key: Metric to maximise
+        latency_key: Metric to minimise
+
+    Returns:
+        Non-dominated rows sorted by latency
+    """
+    front = []
+    for row in rows:
+        dominated = any(
+            other[accuracy_key] >= row[accuracy_key]
+            and other[latency_key] <= row[latency_key]
+            and (other[accuracy_key] > row[accuracy_key] or other[latency_key] < row[latency_key])
+            for other in rows
+        )
+        if not dominated:
+            front.append(row)
+    return sorted(front, key=lambda r: r[latency_key])
+
+
+def write_report(rows: List[Dict[str, Any]], front: List[Dict[str, Any]], output_dir: Path) -> Path:
+    """
+    Write the sweep results as JSON and a Markdown table.
+
+    Args:
+        rows: All evaluated configurations
+        front: Pareto-optimal configurations
+        output_dir: Directory for report.json and report.md
+
+    Returns:
+        Path to the Markdown report
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "report.json").write_text(json.dumps({"results": rows, "pareto_front": front}, indent=2))
+
+    def table(table_rows: List[Dict[str, Any]]) -> List[str]:
+        lines = [
+            "| Model | Device | imgsz | mAP50 | mAP50-95 | p50 ms | p95 ms | FPS |",
+            "|" + "---|" * 8,
+        ]
+        for r in table_rows:
+            lines.append(
+                f"| {Path(r['model']).name} | {r['device']} | {r['imgsz']} "
+                f"| {r['map50']:.3f} | {r['map50_95']:.3f} "
+                f"| {r['latency_p50_ms']:.1f} | {r['latency_p95_ms']:.1f} | {r['throughput_fps']:.1f} |"
+            )
+        return lines
+
+    def threshold_table(table_rows: List[Dict[str, Any]]) -> List[str]:
+        lines = ["| Model | Device | imgsz | conf | P | R |", "|" + "---|" * 6]
+        for r in table_rows:
+            for t in r["thresholds"]:
+                lines.append(
+                    f"| {Path(r['model']).name} | {r['device']} | {r['imgsz']} | {t['conf']} "
+                    f"| {t['precision']:.3f} | {t['recall']:.3f} |"
+                )
+        return lines
+
+    ranked = sorted(rows, key=lambda r: (-r["map50"], r["latency_p50_ms"]))
+    lines = ["# GangaGuard Model Evaluation", "", "## Pareto front (mAP50 vs. p50 latency)", ""]
+    lines += table(front)
+    lines += ["", "## All configurations", ""]
+    lines += table(ranked)
+    lines += ["", "## Precision and recall by confidence threshold (IoU 0.5)", ""]
+    lines += threshold_table(ranked)
+
+    report_path = output_dir / "report.md"
+    report_path.write_text("\n".join(lines) + "\n")
+    return report_path
+
+
+def run_sweep(dataset_dir: Path, models: List[Path], imgsz_values: List[int], devices: List[str],
+              conf_values: List[float], workers: int = EVAL_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Evaluate every combination of model, image size and device.
+
+    Inference configurations run in parallel worker processes, each limited
+    to an equal share of the CPU threads. Concurrent workers still share memory
+    bandwidth, so use workers=1 when latency figures must be comparable with a
+    dedicated deployment.
+
+    Args:
+        dataset_dir: Dataset root
+        models: Model files to evaluate
+        imgsz_values: Inference image sizes
+        devices: Torch device strings
+        conf_values: Confidence thresholds for precision and recall
+        workers: Number of parallel inference processes (capped at the number of configurations)
+
+    Returns:
+        One metrics row per inference configuration
+
+    Raises:
+        ValueError: If workers is less than 1
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    configs = list(itertools.product(models, imgsz_values, devices))
+    caches = []
+    # Idle workers would only shrink the thread share of the ones that run
+    workers = min(workers, len(configs))
+    threads = max(1, len(runtime_config.available_cpus()) // workers)
+    timing_key = f"workers={workers},threads={threads}"
+
+    print(f"🔬 Running {len(configs)} inference configurations with {workers} worker(s), "
+          f"{threads} thread(s) each")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as executor:
+        futures = {
+            executor.submit(run_inference, model_path, imgsz, device, dataset_dir, timing_key):
+                (model_path, imgsz, device)
+            for model_path, imgsz, device in configs
+        }
+        for future in as_completed(futures):
+            model_path, imgsz, device = futures[future]
+            try:
+                caches.append(future.result())
+                print(f"   ✅ {model_path.name} imgsz={imgsz} device={device}")
+            except Exception as e:
+                print(f"   ❌ {model_path.name} imgsz={imgsz} device={device}: {str(e)}")
+
+    rows = []
+    for cache in caches:
+        rows.append({
+            "model": cache["model"],
+            "imgsz": cache["imgsz"],
+            "device": cache["device"],
+            **compute_metrics(cache, dataset_dir, conf_values),
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point for the evaluation sweep."""
+    parser = argparse.ArgumentParser(description="Evaluate GangaGuard models for accuracy vs. speed.")
+    parser.add_argument("dataset", type=Path, help="Dataset root with images/ and labels/")
+    parser.add_argument("--models", type=Path, nargs="+",
+                        help="Model files to evaluate (default: every *.pt in models/)")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640], help="Inference image sizes")
+    parser.add_argument("--device", nargs="+", default=["cpu"], help="Devices, e.g. cpu cuda:0")
+    parser.add_argument("--conf", type=float, nargs="+", default=[0.25],
+                        help="Confidence thresholds for precision/recall")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="Parallel inference processes")
+    parser.add_argument("--output", type=Path, default=EVAL_OUTPUT_DIR, help="Report directory")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    models = args.models or sorted(MODEL_DIR.glob("*.pt"))
+    if not models:
+        print(f"⚠️  No model files found in {MODEL_DIR}")
+        return
+
+    images = find_dataset_images(args.dataset)
+    if not images:
+        print(f"⚠️  No images found in {args.dataset}")
+        return
+
+    print("🚀 Starting GangaGuard model evaluation...")
+    print(f"📁 Dataset: {args.dataset} ({len(images)} images)")
+
+    rows = run_sweep(args.dataset, models, args.imgsz, args.device, args.conf, args.workers)
+    if not rows:
+        print("❌ No configuration could be evaluated.")
+        return
+
+    front = pareto_front(rows)
+    report_path = write_report(rows, front, args.output)
+
+    print("\n🏆 Pareto front (mAP50 vs. p50 latency):")
+    for r in front:
+        print(f"   {Path(r['model']).name} imgsz={r['imgsz']} device={r['device']}: "
+              f"mAP50={r['map50']:.3f}, p50={r['latency_p50_ms']:.1f} ms, {r['throughput_fps']:.1f} FPS")
+    print(f"\n📄 Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Detection event stream for GangaGuard
+Publishes compact detection events (timestamp, stream ID, labels, confidences,
+boxes; no pixels) to live dashboards over NDJSON-over-HTTP.
+
+Each subscriber holds at most one pending event per stream. A new event for a
+stream that still has one pending replaces it in place (coalescing), so a slow
+dashboard is at most one event behind on each stream, and detection never waits
+on a client. The next event delivered for that stream carries a "dropped" count.
+
+Endpoints:
+    GET /events                  Newline-delimited JSON, one event per line
+    GET /events?stream=camera-0  Only events from one stream
+    GET /events?format=sse       Server-Sent Events, for browser EventSource clients
+
+Environment variables:
+    EVENT_STREAM_ENABLED   "1" to start the event server (default: "0")
+    EVENT_STREAM_HOST      Bind address (default: 127.0.0.1)
+    EVENT_STREAM_PORT      Port (default: 8765)
+    EVENT_STREAM_BUFFER    Streams with a pending event per subscriber (default: 64)
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Optional, Dict, Any, List, Tuple
+
+# Configuration
+EVENT_STREAM_ENABLED = os.getenv("EVENT_STREAM_ENABLED", "0") == "1"
+EVENT_STREAM_HOST = os.getenv("EVENT_STREAM_HOST", "127.0.0.1")
+EVENT_STREAM_PORT = int(os.getenv("EVENT_STREAM_PORT", "8765"))
+EVENT_STREAM_BUFFER = int(os.getenv("EVENT_STREAM_BUFFER", "64"))
+HEARTBEAT_SECONDS = 15  # keeps idle connections and proxies alive
+
+
+def make_event(stream_id: str, detection: Dict[str, Any], frame_size: Optional[Tuple[int, int]] = None,
+               source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a compact detection event from a detect_garbage() result.
+
+    Args:
+        stream_id: Camera or batch identifier, e.g. "camera-0"
+        detection: Dictionary returned by MLService.detect_garbage()
+        frame_size: (width, height) of the frame, so clients can scale boxes (optional)
+        source: Image file name for bulk processing (optional)
+
+    Returns:
+        Event dictionary with boxes as [x1, y1, x2, y2] in pixels
+    """
+    rows = detection.get("boxes", [])
+    event = {
+        "type": "detection",
+        "ts": time.time(),
+        "stream": stream_id,
+        "count": detection.get("count", 0),
+        "labels": detection.get("labels", []),
+        "confidences": [round(row[4], 3) for row in rows],
+        "boxes": [[round(value, 1) for value in row[:4]] for row in rows],
+    }
+    if frame_size:
+        event["size"] = list(frame_size)
+    if source:
+        event["source"] = source
+    return event
+
+
+class Subscriber:
+    """Coalescing event buffer for one connected client: the latest pending event per stream."""
+
+    def __init__(self, max_events: int = EVENT_STREAM_BUFFER, stream_id: Optional[str] = None):
+        """
+        Args:
+            max_events: Maximum number of streams with a pending event
+            stream_id: Only accept events from this stream (optional)
+        """
+        self.max_events = max(1, max_events)
+        self.stream_id = stream_id
+        self._events: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()  # stream -> latest pending event
+        self._dropped: Dict[Any, int] = {}  # stream -> events coalesced since its last delivery
+        self._condition = threading.Condition()
+
+    def put(self, event: Dict[str, Any]):
+        """
+        Queue an event without blocking.
+
+        A pending event from the same stream is replaced in place, keeping the
+        stream's place in the delivery order. If a new stream arrives while
+        max_events streams are pending, the oldest stream's event is dropped.
+        """
+        stream = event.get("stream")
+        if self.stream_id is not None and stream != self.stream_id:
+            return
+
+        with self._condition:
+            if stream in self._events:
+                self._dropped[stream] = self._dropped.get(stream, 0) + 1
+            elif len(self._events) >= self.max_events:
+                oldest, _ = self._events.popitem(last=False)
+                self._dropped[oldest] = self._dropped.get(oldest, 0) + 1
+            self._events[stream] = event
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            The next event, with "dropped" set to the number of events from the
+            same stream coalesced since that stream's last delivery, or None on timeout
+        """
+        with self._condition:
+            if not self._events and not self._condition.wait_for(lambda: self._events, timeout):
+                return None
+            stream, event = self._events.popitem(last=False)
+            dropped = self._dropped.pop(stream, 0)
+            if dropped:
+                event = {**event, "dropped": dropped}
+            return event
+
+
+class EventBroker:
+    """Fans detection events out to all connected subscribers."""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, stream_id: Optional[str] = None, max_events: int = EVENT_STREAM_BUFFER) -> Subscriber:
+        """Register a new subscriber, optionally filtered to one stream."""
+        subscriber = Subscriber(max_events, stream_id)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a subscriber."""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event: Dict[str, Any]):
+        """Send an event to every subscriber. Never blocks on slow clients."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+class EventStreamHandler(BaseHTTPRequestHandler):
+    """Streams events from the server's broker to one HTTP client."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/events":
+            self.send_error(404, "Use GET /events")
+            return
+
+        query = parse_qs(url.query)
+        stream_id = query.get("stream", [None])[0]
+        sse = query.get("format", ["ndjson"])[0] == "sse"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        broker = self.server.broker
+        subscriber = broker.subscribe(stream_id)
+        try:
+            while True:
+                event = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                if event is None:
+                    event = {"type": "heartbeat", "ts": time.time()}
+                line = json.dumps(event, separators=(",", ":"))
+                self.wfile.write((f"data: {line}\n\n" if sse else f"{line}\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            broker.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        # Per-request logging would flood the console for long-lived streams
+        pass
+
+
+# Shared broker used by the video and bulk detection paths
+broker = EventBroker()
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_event_stream(host: str = EVENT_STREAM_HOST, port: int = EVENT_STREAM_PORT) -> Optional[ThreadingHTTPServer]:
+    """
+    Start the event server in a background thread (once per process).
+
+    Args:
+        host: Bind address
+        port: Port to listen on
+
+    Returns:
+        The running server, or None if it could not be started
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            server = ThreadingHTTPServer((host, port), EventStreamHandler)
+        except OSError as e:
+            print(f"❌ Could not start event stream on {host}:{port}: {str(e)}")
+            return None
+        server.daemon_threads = True
+        server.broker = broker
+        threading.Thread(target=server.serve_forever, name="event-stream", daemon=True).start()
+        _server = server
+        print(f"📺 Detection event stream: http://{host}:{port}/events")
+        return server
+
+
+def publish_detection(stream_id: str, detection: Optional[Dict[str, Any]],
+                      frame_size: Optional[Tuple[int, int]] = None, source: Optional[str] = None):
+    """
+    Publish a detect_garbage() result to live subscribers.
+
+    Cheap when nobody is connected, so it can be called for every frame.
+
+    Args:
+        stream_id: Camera or batch identifier
+        detection: Dictionary returned by MLService.detect_garbage()
+        frame_size: (width, height) of the frame (optional)
+        source: Image file name for bulk processing (optional)
+    """
+    if detection is None or broker.subscriber_count == 0:
+        return
+    broker.publish(make_event(stream_id, detection, frame_size, source))
@@ -7,10 +7,15 @@ import base64
 import requests
 from pathlib import Path
 from typing import Optional, Dict, Any, Union
+# Imported before numpy/torch so the BLAS thread budget is exported in time
+# when ml_service is the first import; entry points import runtime_config first
+from runtime_config import configure_runtime
 from PIL import Image
 import numpy as np
 import cv2
 from ultralytics import YOLO
+from cascade import CascadeGate, CASCADE_ENABLED, CASCADE_GATE_MODEL
+from event_stream import publish_detection, start_event_stream, EVENT_STREAM_ENABLED
 
 # Configuration
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:4000")
@@ -21,16 +26,26 @@ API_ENDPOINT = f"{BACKEND_API_URL}/api/incidents/ml"
 class MLService:
     """Main ML service class that handles YOLO model loading and inference."""
     
-    def __init__(self, model_path: Optional[Path] = None):
+    def __init__(self, model_path: Optional[Path] = None, use_cascade: Optional[bool] = None):
         """
         Initialize the ML service with YOLO model.
         
         Args:
             model_path: Path to the trained model file. If None, looks in models/ folder.
+            use_cascade: Run a cheap low-resolution gate before full detection.
+                         If None, uses the CASCADE_ENABLED environment variable.
         """
         self.model = None
+        self.cascade = None
+        self.last_detection = None  # Result of the most recent process_frame() call
         self.model_path = model_path or self._find_model()
+        self.runtime = configure_runtime("inference")
         self._load_model()
+        
+        if use_cascade is None:
+            use_cascade = CASCADE_ENABLED
+        if use_cascade:
+            self._load_cascade()
     
     def _find_model(self) -> Optional[Path]:
         """Find model file in the models directory."""
@@ -63,10 +78,26 @@ class MLService:
             self.model = YOLO(str(self.model_path))
             print(f"✅ Model loaded successfully!")
             print(f"   Classes: {list(self.model.names.values())}")
+            print(f"   Threads: {self.runtime['threads']} on CPUs {self.runtime['cpus']}")
         except Exception as e:
             print(f"❌ Error loading model: {str(e)}")
             self.model = None
     
+    def _load_cascade(self):
+        """Set up the first-stage gate that decides when to run the full detector."""
+        if self.model is None:
+            print("⚠️  No model loaded. Cascade gate disabled.")
+            return
+        
+        try:
+            gate_model_path = Path(CASCADE_GATE_MODEL) if CASCADE_GATE_MODEL else None
+            self.cascade = CascadeGate(self.model, gate_model_path)
+            print(f"🚦 Cascade gate enabled: {gate_model_path or 'low-resolution detector pass'} "
+                  f"at {self.cascade.imgsz}px, threshold {self.cascade.threshold}")
+        except Exception as e:
+            print(f"❌ Error loading cascade gate: {str(e)}")
+            self.cascade = None
+    
     def detect_garbage(self, image: Union[Image.Image, np.ndarray]) -> Dict[str, Any]:
         """
         Run YOLO inference on an image to detect garbage.
@@ -100,6 +131,20 @@ class MLService:
             else:
                 image_array = image
             
+            # Cheap first stage: skip the full detector on frames the gate rejects,
+            # except for a sample audited to measure what the gate misses
+            audit = False
+            if self.cascade is not None:
+                passed, audit = self.cascade.check(image_array)
+                if not passed and not audit:
+                    return {
+                        "has_garbage": False,
+                        "confidence": 0.0,
+                        "labels": [],
+                        "boxes": [],
+                        "count": 0
+                    }
+            
             # Run YOLO inference
             results = self.model(image_array, verbose=False)[0]
             
@@ -127,6 +172,9 @@ class MLService:
             # Calculate average confidence
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
             
+            if audit:
+                self.cascade.record_audit(len(labels))
+            
             return {
                 "has_garbage": True,
                 "confidence": avg_confidence,
@@ -145,7 +193,8 @@ class MLService:
             }
     
     def process_image(self, image_path: Path, lat: Optional[float] = None, 
-                     lng: Optional[float] = None, location_text: Optional[str] = None) -> bool:
+                     lng: Optional[float] = None, location_text: Optional[str] = None,
+                     stream_id: Optional[str] = None) -> bool:
         """
         Process an image file and send detected incidents to the backend.
         
@@ -154,6 +203,7 @@ class MLService:
             lat: Latitude (optional)
             lng: Longitude (optional)
             location_text: Location description (optional)
+            stream_id: Event stream ID for live dashboards (default: parent folder name)
             
         Returns:
             True if incident was successfully sent, False otherwise
@@ -162,6 +212,8 @@ class MLService:
             # Load and process image
             image = Image.open(image_path)
             detection = self.detect_garbage(image)
+            publish_detection(stream_id or image_path.parent.name, detection,
+                              frame_size=image.size, source=image_path.name)
             
             # Only send if garbage is detected
             if not detection.get("has_garbage", False):
@@ -229,9 +281,10 @@ class MLService:
             
             # Run detection
             detection = self.detect_garbage(frame_rgb)
+            self.last_detection = detection
             
-            # Get annotated frame from YOLO
-            if self.model:
+            # Get annotated frame from YOLO (frames without detections need no overlay)
+            if self.model and detection.get("has_garbage", False):
                 results = self.model(frame_rgb, verbose=False)[0]
                 annotated_frame = results.plot()
                 annotated_frame_bgr = cv2.cvtColor(annotated_frame, cv2.COLOR_RGB2BGR)
@@ -266,9 +319,12 @@ def process_image_folder(folder_path: Path, ml_service: MLService):
     
     print(f"📁 Processing {len(image_files)} images from {folder_path}")
     
+    if EVENT_STREAM_ENABLED:
+        start_event_stream()
+    
     for img_path in image_files:
         print(f"\n📸 Processing: {img_path.name}")
-        ml_service.process_image(img_path)
+        ml_service.process_image(img_path, stream_id=folder_path.name)
 
 
 def main():
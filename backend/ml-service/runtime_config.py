@@ -0,0 +1,320 @@
+"""
+Runtime configuration for GangaGuard ML Service
+Sets a CPU thread budget for torch, OpenCV and NumPy BLAS, optionally pins
+threads to cores or a NUMA node, and partitions cores between capture,
+inference and upload so several detector processes do not oversubscribe the host.
+
+BLAS libraries read their thread count when NumPy is first imported, so this
+module exports the thread environment variables on import. Entry points import
+it before anything that loads numpy (cv2, PIL, ultralytics); if NumPy is
+already loaded, threadpoolctl limits the running BLAS pools instead.
+
+Environment variables:
+    ML_INFERENCE_THREADS  Intra-op threads per detector process (default: its share of inference cores)
+    ML_CPU_PARTITION      Cores per role, e.g. "capture:1,inference:6,upload:1" (default: all roles share every core)
+    ML_PIN_THREADS        "1" to pin threads to their role's cores (default: "0")
+    ML_NUMA_NODE          Restrict all roles to the CPUs of this NUMA node (implies pinning)
+    ML_WORKER_PROCESSES   Detector processes sharing the inference cores (default: 1)
+    ML_WORKER_INDEX       Index of this detector process, 0-based (default: 0)
+"""
+import os
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+
+def _env_int(name: str, default: Optional[int], minimum: int = 0) -> Optional[int]:
+    """
+    Read an integer environment variable, falling back to the default if it is malformed.
+
+    This module runs at import time of ml_service, so a typo must not stop the
+    service from starting.
+    """
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        print(f"⚠️  Invalid {name}='{value}'. Expected an integer. Using the default.")
+        return default
+    if parsed < minimum:
+        print(f"⚠️  Invalid {name}={parsed}. Expected at least {minimum}. Using the default.")
+        return default
+    return parsed
+
+
+# Configuration
+ML_INFERENCE_THREADS = _env_int("ML_INFERENCE_THREADS", None, minimum=1)
+ML_CPU_PARTITION = os.getenv("ML_CPU_PARTITION", "")
+ML_PIN_THREADS = os.getenv("ML_PIN_THREADS", "0") == "1"
+ML_NUMA_NODE = _env_int("ML_NUMA_NODE", None)
+ML_WORKER_PROCESSES = _env_int("ML_WORKER_PROCESSES", 1, minimum=1)
+ML_WORKER_INDEX = _env_int("ML_WORKER_INDEX", 0)
+NUMA_NODE_DIR = Path("/sys/devices/system/node")
+ROLES = ("capture", "inference", "upload")
+BLAS_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """
+    Parse a Linux CPU list such as "0-3,8,10-11".
+
+    Args:
+        cpu_list: Comma-separated CPU ids and ranges
+
+    Returns:
+        Sorted list of CPU ids
+    """
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def numa_node_cpus(node: int) -> List[int]:
+    """Return the CPUs of a NUMA node, or an empty list if the node is unknown."""
+    cpulist = NUMA_NODE_DIR / f"node{node}" / "cpulist"
+    if not cpulist.exists():
+        return []
+    return parse_cpu_list(cpulist.read_text())
+
+
+def available_cpus() -> List[int]:
+    """
+    CPUs this process may run on, limited to ML_NUMA_NODE when it is set.
+
+    Returns:
+        Sorted list of CPU ids
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+
+    if ML_NUMA_NODE is not None:
+        node_cpus = set(numa_node_cpus(ML_NUMA_NODE))
+        restricted = [cpu for cpu in cpus if cpu in node_cpus]
+        if restricted:
+            return restricted
+        print(f"⚠️  NUMA node {ML_NUMA_NODE} has no usable CPUs. Using all available CPUs.")
+    return cpus
+
+
+def parse_partition(spec: str) -> Dict[str, int]:
+    """
+    Parse a partition spec such as "capture:1,inference:6,upload:1".
+
+    Args:
+        spec: Comma-separated role:core_count pairs
+
+    Returns:
+        Dictionary mapping role to requested core count
+    """
+    counts = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        role, _, count = part.partition(":")
+        role = role.strip()
+        if role not in ROLES:
+            print(f"⚠️  Unknown role '{role}' in ML_CPU_PARTITION. Expected one of {', '.join(ROLES)}.")
+            continue
+        try:
+            counts[role] = max(1, int(count))
+        except ValueError:
+            print(f"⚠️  Invalid core count '{part.strip()}' in ML_CPU_PARTITION. Expected role:count.")
+    return counts
+
+
+def partition_cores(cpus: List[int], counts: Optional[Dict[str, int]] = None) -> Dict[str, List[int]]:
+    """
+    Split CPUs between the capture, inference and upload roles.
+
+    Without explicit counts every role shares all cores, so a single detector
+    that captures, infers and uploads on one thread keeps every core for
+    inference. Reserve cores for capture and upload only when those run on
+    their own threads that call configure_runtime() with their role. If the
+    requested counts exceed the available cores, every role shares all cores
+    rather than being squeezed onto an arbitrary subset.
+
+    Args:
+        cpus: CPUs to divide
+        counts: Requested cores per role
+
+    Returns:
+        Dictionary mapping each role to its CPU ids
+    """
+    if not counts:
+        return {role: list(cpus) for role in ROLES}
+
+    if sum(counts.values()) > len(cpus):
+        print(f"⚠️  CPU partition {counts} needs more than {len(cpus)} cores. Roles will share all cores.")
+        return {role: list(cpus) for role in ROLES}
+
+    partition = {}
+    offset = 0
+    for role in ROLES:
+        count = counts.get(role, 0)
+        partition[role] = cpus[offset:offset + count]
+        offset += count
+
+    # Roles left out of the spec run on whatever is not reserved
+    leftover = cpus[offset:] or list(cpus)
+    for role in ROLES:
+        if not partition[role]:
+            partition[role] = leftover
+    return partition
+
+
+def worker_cores(inference_cpus: List[int], workers: int = ML_WORKER_PROCESSES,
+                 index: int = ML_WORKER_INDEX) -> List[int]:
+    """
+    Share of the inference cores for one of several detector processes.
+
+    Args:
+        inference_cpus: CPUs reserved for inference
+        workers: Number of detector processes
+        index: Index of this process, 0-based
+
+    Returns:
+        CPU ids for this process (at least one)
+    """
+    if workers <= 1:
+        return list(inference_cpus)
+    share = max(1, len(inference_cpus) // workers)
+    start = (index * share) % len(inference_cpus)
+    return inference_cpus[start:start + share] or inference_cpus[:share]
+
+
+def apply_thread_env(threads: int):
+    """
+    Export BLAS/OpenMP thread counts for libraries that have not been loaded yet.
+
+    Args:
+        threads: Thread count to export
+    """
+    for name in BLAS_THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+
+def set_blas_threads(threads: int):
+    """Limit NumPy BLAS threads, including libraries that are already loaded."""
+    apply_thread_env(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+
+def set_torch_threads(threads: int):
+    """Set torch intra-op threads and keep inter-op parallelism to a single thread."""
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before torch has started any parallel work
+        pass
+
+
+def set_opencv_threads(threads: int):
+    """Set the OpenCV worker thread count."""
+    try:
+        import cv2
+    except ImportError:
+        return
+    cv2.setNumThreads(threads)
+
+
+def pin_current_thread(cpus: List[int]) -> bool:
+    """
+    Pin the calling thread to the given CPUs.
+
+    On Linux, sched_setaffinity(0, ...) applies to the calling thread, so
+    capture, inference and upload threads can each be pinned to their own cores.
+    Threads started afterwards inherit the affinity.
+
+    Args:
+        cpus: CPU ids to run on
+
+    Returns:
+        True if the affinity was applied, False otherwise
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except OSError as e:
+        print(f"⚠️  Could not pin thread to CPUs {cpus}: {str(e)}")
+        return False
+
+
+def default_threads() -> int:
+    """Intra-op thread count for this detector process."""
+    if ML_INFERENCE_THREADS:
+        return ML_INFERENCE_THREADS
+    partition = partition_cores(available_cpus(), parse_partition(ML_CPU_PARTITION))
+    return len(worker_cores(partition["inference"]))
+
+
+def configure_runtime(role: str = "inference", threads: Optional[int] = None,
+                      pin: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Apply the thread budget and affinity for the calling thread's role.
+
+    For the inference role the torch, OpenCV and BLAS thread counts are set to
+    this process's share of the inference cores (or `threads`). Other roles are
+    only pinned, since capture and upload do no heavy math.
+
+    Args:
+        role: One of "capture", "inference", "upload"
+        threads: Intra-op thread count (default: ML_INFERENCE_THREADS or the core share)
+        pin: Pin the calling thread to the role's cores (default: ML_PIN_THREADS,
+             or always when ML_NUMA_NODE is set, since the node can only be
+             enforced through affinity)
+
+    Returns:
+        Dictionary describing the applied configuration
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown role '{role}'. Expected one of {', '.join(ROLES)}.")
+
+    partition = partition_cores(available_cpus(), parse_partition(ML_CPU_PARTITION))
+    cpus = worker_cores(partition["inference"]) if role == "inference" else partition[role]
+    if pin is None:
+        pin = ML_PIN_THREADS or ML_NUMA_NODE is not None
+
+    applied = {"role": role, "cpus": cpus, "pinned": False, "threads": None}
+    if pin:
+        applied["pinned"] = pin_current_thread(cpus)
+
+    if role == "inference":
+        threads = threads or default_threads()
+        set_torch_threads(threads)
+        set_opencv_threads(threads)
+        set_blas_threads(threads)
+        applied["threads"] = threads
+
+    return applied
+
+
+# Export thread counts before NumPy/torch are imported by the caller
+if not any(name in os.environ for name in BLAS_THREAD_ENV_VARS):
+    apply_thread_env(default_threads())
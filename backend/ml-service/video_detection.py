@@ -5,10 +5,13 @@ Uses YOLO model to detect garbage in live camera feed and sends incidents to bac
 import os
 import base64
 import time
+# Imported before cv2 (which loads numpy) so the BLAS thread budget is exported in time
+import runtime_config
 import cv2
 import requests
 from pathlib import Path
 from ml_service import MLService
+from event_stream import publish_detection, start_event_stream, EVENT_STREAM_ENABLED
 
 # Configuration
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:4000")
@@ -67,7 +70,8 @@ def run_video_detection(camera_index: int = CAMERA_INDEX,
                        cooldown: int = COOLDOWN_SECONDS,
                        lat: float = None,
                        lng: float = None,
-                       location_text: str = None):
+                       location_text: str = None,
+                       stream_id: str = None):
     """
     Run real-time video detection from camera feed.
     
@@ -77,7 +81,9 @@ def run_video_detection(camera_index: int = CAMERA_INDEX,
         lat: Latitude for incidents (optional)
         lng: Longitude for incidents (optional)
         location_text: Location description (optional)
+        stream_id: Event stream ID for live dashboards (default: "camera-<index>")
     """
+    stream_id = stream_id or f"camera-{camera_index}"
     print("🚀 Starting GangaGuard Video Detection...")
     print(f"📡 Backend API: {BACKEND_API_URL}")
     print(f"📹 Camera: {camera_index}")
@@ -98,6 +104,9 @@ def run_video_detection(camera_index: int = CAMERA_INDEX,
         print(f"❌ Error: Could not open camera {camera_index}")
         return
     
+    if EVENT_STREAM_ENABLED:
+        start_event_stream()
+    
     last_alert_time = 0
     detection_start_time = None
     
@@ -111,14 +120,17 @@ def run_video_detection(camera_index: int = CAMERA_INDEX,
             # Process frame with ML service
             has_garbage, annotated_frame = ml_service.process_frame(frame)
             
+            # Publish every frame's result (including empty ones) to live dashboards
+            publish_detection(stream_id, ml_service.last_detection,
+                              frame_size=(frame.shape[1], frame.shape[0]))
+            
             # Display annotated frame
             cv2.imshow("GangaGuard - Garbage Detection (Press 'q' to quit)", annotated_frame)
             
             # Check if garbage detected and cooldown passed
             if has_garbage:
-                # Get detection details
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                detection = ml_service.detect_garbage(frame_rgb)
+                # Get detection details from the frame just processed
+                detection = ml_service.last_detection or {}
                 labels = detection.get("labels", [])
 
                 current_time = time.time()
@@ -158,6 +170,11 @@ def run_video_detection(camera_index: int = CAMERA_INDEX,
     finally:
         cap.release()
         cv2.destroyAllWindows()
+        if ml_service.cascade is not None:
+            stats = ml_service.cascade.stats()
+            print(f"🚦 Cascade: skipped full detection on {stats['skipped']}/{stats['frames']} frames "
+                  f"({stats['skip_rate']:.1%}), audited {stats['audited']} of {stats['rejected']} rejected, "
+                  f"estimated missed detections: {stats['missed_detections_estimate']:.0f}")
         print("✅ Video detection stopped.")
 
 